@@ -2,69 +2,194 @@
 Module pour charger et préparer les données de prédiction
 """
 
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from typing import Dict, Tuple
 
+# Numba est optionnel : s'il est présent, le calcul des croissances est
+# compilé en une seule passe mémoire ; sinon on retombe sur NumPy
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+if njit is not None:
+    @njit(cache=True, error_model='numpy')
+    def _growth_kernel(arr, out):
+        """Remplit les trois colonnes de croissance en un seul parcours"""
+        for i in range(arr.shape[0]):
+            m1, m2, m3 = arr[i, 0], arr[i, 1], arr[i, 2]
+            out[i, 0] = (m2 - m1) / m1 * 100.0
+            out[i, 1] = (m3 - m2) / m2 * 100.0
+            out[i, 2] = (m3 - m1) / m1 * 100.0
+else:
+    _growth_kernel = None
+
 
 class DataLoader:
     """Charge et prépare les données de prédiction"""
     
-    def __init__(self, monthly_path: str, daily_path: str):
+    def __init__(self, monthly_path: str = None, daily_path: str = None):
         """
         Initialise le chargeur de données
-        
+
         Args:
             monthly_path: Chemin vers le fichier CSV des prédictions mensuelles
             daily_path: Chemin vers le fichier CSV des prédictions journalières
         """
-        self.monthly_path = Path(monthly_path)
-        self.daily_path = Path(daily_path)
+        self.monthly_path = Path(monthly_path) if monthly_path else None
+        self.daily_path = Path(daily_path) if daily_path else None
         self.monthly_df = None
         self.daily_df = None
-    
+        self._products = None
+        self._cities = None
+        self._product_groups = None
+        self._city_groups = None
+        self._stats = None
+
+    @classmethod
+    def from_frames(cls, monthly_df: pd.DataFrame, daily_df: pd.DataFrame) -> 'DataLoader':
+        """
+        Construit un chargeur à partir de DataFrames déjà chargés
+
+        Permet de garder les DataFrames dans un cache externe (par ex.
+        st.cache_data) et de reconstruire les index dérivés sans relire les
+        fichiers.
+
+        Args:
+            monthly_df: Prédictions mensuelles
+            daily_df: Prédictions journalières
+
+        Returns:
+            Instance de DataLoader prête à l'emploi
+        """
+        loader = cls()
+        loader.monthly_df = monthly_df
+        loader.daily_df = daily_df
+        loader._build_caches()
+        return loader
+
+    def _read_with_parquet_cache(self, csv_path: Path, **read_csv_kwargs) -> pd.DataFrame:
+        """
+        Lit un CSV en le mettant en cache au format Parquet
+
+        Le fichier Parquet (typé, colonnaire) est écrit à côté du CSV lors de
+        la première lecture ; les chargements suivants le relisent sans
+        re-parser le texte. Le cache est invalidé si le CSV est plus récent.
+
+        Args:
+            csv_path: Chemin vers le fichier CSV
+            **read_csv_kwargs: Arguments passés à pd.read_csv
+
+        Returns:
+            DataFrame chargé
+        """
+        parquet_path = csv_path.with_suffix('.parquet')
+
+        if parquet_path.exists() and parquet_path.stat().st_mtime >= csv_path.stat().st_mtime:
+            return pd.read_parquet(parquet_path, engine='pyarrow')
+
+        df = pd.read_csv(csv_path, **read_csv_kwargs)
+        try:
+            df.to_parquet(parquet_path, compression='snappy')
+        except OSError:
+            # Système de fichiers en lecture seule (image Docker) : on garde
+            # simplement le chemin CSV
+            pass
+
+        return df
+
     def load_data(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """
-        Charge les données depuis les fichiers CSV
-        
+        Charge les données depuis les fichiers CSV (via le cache Parquet)
+
         Returns:
             Tuple contenant (monthly_df, daily_df)
         """
         # Charger les données mensuelles
-        self.monthly_df = pd.read_csv(self.monthly_path)
-        
+        # Les colonnes texte sont catégorielles : les filtres (==, isin) et
+        # les groupby travaillent alors sur des codes entiers plutôt que sur
+        # des chaînes Python, pour une fraction de la mémoire
+        # Le moteur pyarrow parse le CSV en parallèle, et float32 suffit
+        # largement pour des quantités prédites
+        self.monthly_df = self._read_with_parquet_cache(
+            self.monthly_path,
+            engine='pyarrow',
+            dtype={
+                'Product': 'category',
+                'City_State': 'category',
+                'Month': 'category',
+                'Predicted_Quantity': 'float32'
+            }
+        )
+
         # Charger les données journalières
-        self.daily_df = pd.read_csv(self.daily_path)
-        self.daily_df['Date'] = pd.to_datetime(self.daily_df['Date'])
-        
+        # Les dates sont parsées directement par read_csv : le format ISO
+        # explicite emprunte le chemin rapide en C de pandas, sans repasse
+        # Python sur la colonne
+        self.daily_df = self._read_with_parquet_cache(
+            self.daily_path,
+            engine='pyarrow',
+            dtype={
+                'Product': 'category',
+                'City_State': 'category',
+                'Predicted_Quantity': 'float32'
+            },
+            parse_dates=['Date'],
+            date_format='%Y-%m-%d'
+        )
+
+        self._build_caches()
+
         return self.monthly_df, self.daily_df
-    
-    def get_summary_stats(self) -> Dict:
-        """
-        Calcule des statistiques résumées sur les données
-        
-        Returns:
-            Dictionnaire avec les statistiques
-        """
-        if self.monthly_df is None or self.daily_df is None:
-            self.load_data()
-        
-        stats = {
+
+    def _build_caches(self):
+        """Précalcule les index et statistiques dérivés des DataFrames"""
+        # Précalculer les valeurs réutilisées par les autres méthodes
+        self._products = self.monthly_df['Product'].unique()
+        self._cities = self.monthly_df['City_State'].unique()
+
+        # Index de lignes par produit et par ville : les filtres deviennent
+        # un lookup de dictionnaire au lieu d'un scan booléen de la colonne
+        self._product_groups = self.monthly_df.groupby(
+            'Product', observed=True
+        ).groups
+        self._city_groups = self.monthly_df.groupby(
+            'City_State', observed=True
+        ).groups
+
+        # Construire les statistiques une seule fois : les données ne changent
+        # pas après le chargement, inutile de rescanner les DataFrames
+        total_demand = (
+            self.monthly_df
+            .groupby('Product', sort=False, observed=True)['Predicted_Quantity']
+            .sum()
+            .astype(int)
+        )
+        self._stats = {
             'total_predictions': len(self.daily_df),
-            'products': self.monthly_df['Product'].unique().tolist(),
-            'cities': self.monthly_df['City_State'].unique().tolist(),
+            'products': self._products.tolist(),
+            'cities': self._cities.tolist(),
             'months': sorted(self.monthly_df['Month'].unique().tolist()),
             'date_range': {
                 'start': self.daily_df['Date'].min().strftime('%Y-%m-%d'),
                 'end': self.daily_df['Date'].max().strftime('%Y-%m-%d')
             },
-            'total_demand': {
-                product: int(self.monthly_df[self.monthly_df['Product'] == product]['Predicted_Quantity'].sum())
-                for product in self.monthly_df['Product'].unique()
-            }
+            'total_demand': total_demand.to_dict()
         }
-        
-        return stats
+
+    def get_summary_stats(self) -> Dict:
+        """
+        Retourne les statistiques résumées précalculées au chargement
+
+        Returns:
+            Dictionnaire avec les statistiques
+        """
+        if self._stats is None:
+            self.load_data()
+
+        return self._stats
     
     def get_product_data(self, product: str) -> pd.DataFrame:
         """
@@ -78,8 +203,11 @@ class DataLoader:
         """
         if self.monthly_df is None:
             self.load_data()
-        
-        return self.monthly_df[self.monthly_df['Product'] == product].copy()
+
+        if product not in self._product_groups:
+            return self.monthly_df.iloc[0:0]
+
+        return self.monthly_df.loc[self._product_groups[product]]
     
     def get_city_data(self, city_state: str) -> pd.DataFrame:
         """
@@ -93,8 +221,11 @@ class DataLoader:
         """
         if self.monthly_df is None:
             self.load_data()
-        
-        return self.monthly_df[self.monthly_df['City_State'] == city_state].copy()
+
+        if city_state not in self._city_groups:
+            return self.monthly_df.iloc[0:0]
+
+        return self.monthly_df.loc[self._city_groups[city_state]]
     
     def compare_cities(self, city1: str, city2: str, product: str = None) -> pd.DataFrame:
         """
@@ -111,7 +242,7 @@ class DataLoader:
         if self.monthly_df is None:
             self.load_data()
         
-        df = self.monthly_df[self.monthly_df['City_State'].isin([city1, city2])].copy()
+        df = self.monthly_df[self.monthly_df['City_State'].isin([city1, city2])]
         
         if product:
             df = df[df['Product'] == product]
@@ -132,16 +263,15 @@ class DataLoader:
         if self.monthly_df is None:
             self.load_data()
         
-        product_df = self.monthly_df[self.monthly_df['Product'] == product].copy()
+        product_df = self.get_product_data(product)
         top_cities = (
             product_df
-            .groupby('City_State')['Predicted_Quantity']
+            .groupby('City_State', observed=True)['Predicted_Quantity']
             .sum()
-            .sort_values(ascending=False)
-            .head(n)
+            .nlargest(n)
             .reset_index()
         )
-        
+
         return top_cities
     
     def calculate_growth(self, product: str = None) -> pd.DataFrame:
@@ -157,28 +287,51 @@ class DataLoader:
         if self.monthly_df is None:
             self.load_data()
         
-        df = self.monthly_df.copy()
+        df = self.monthly_df
         if product:
             df = df[df['Product'] == product]
         
-        # Pivoter pour avoir les mois en colonnes
-        pivot = df.pivot_table(
-            values='Predicted_Quantity',
-            index=['Product', 'City_State'],
-            columns='Month',
-            aggfunc='sum'
+        # Pivoter pour avoir les mois en colonnes : groupby + unstack suit le
+        # chemin direct de pandas, sans la machinerie générique de
+        # pivot_table. observed=True : ne garder que les combinaisons
+        # présentes dans les données (les catégories filtrées ne créent pas
+        # de lignes vides)
+        pivot = (
+            df
+            .groupby(['Product', 'City_State', 'Month'], observed=True, sort=False)['Predicted_Quantity']
+            .sum()
+            .unstack('Month')
         )
-        
-        # Calculer les croissances
-        months = sorted(pivot.columns)
-        if len(months) >= 2:
+
+        # Trier les colonnes de mois une fois pour toutes
+        pivot = pivot.reindex(sorted(pivot.columns), axis=1)
+
+        # Calculer les croissances d'un seul passage NumPy sur le tableau
+        # sous-jacent plutôt que colonne par colonne en pandas
+        months = list(pivot.columns)
+        if len(months) >= 3 and _growth_kernel is not None:
+            # Noyau Numba : les trois colonnes écrites en un seul parcours
+            arr = pivot[months[:3]].to_numpy(dtype='float64')
+            out = np.empty((arr.shape[0], 3), dtype='float64')
+            _growth_kernel(arr, out)
+            out = np.round(out, 2)
+            pivot['Growth_M1_M2'] = out[:, 0]
+            pivot['Growth_M2_M3'] = out[:, 1]
+            pivot['Growth_Total'] = out[:, 2]
+
+        elif len(months) >= 2:
+            arr = pivot[months[:3]].to_numpy(dtype='float64')
+
+            # Croissances mois à mois : (M[n+1] - M[n]) / M[n]
+            growth = np.round(np.diff(arr, axis=1) / arr[:, :-1] * 100, 2)
+
             # Croissance du premier au deuxième mois
-            pivot['Growth_M1_M2'] = ((pivot[months[1]] - pivot[months[0]]) / pivot[months[0]] * 100).round(2)
-            
+            pivot['Growth_M1_M2'] = growth[:, 0]
+
             if len(months) >= 3:
                 # Croissance du deuxième au troisième mois
-                pivot['Growth_M2_M3'] = ((pivot[months[2]] - pivot[months[1]]) / pivot[months[1]] * 100).round(2)
+                pivot['Growth_M2_M3'] = growth[:, 1]
                 # Croissance totale
-                pivot['Growth_Total'] = ((pivot[months[2]] - pivot[months[0]]) / pivot[months[0]] * 100).round(2)
+                pivot['Growth_Total'] = np.round((arr[:, 2] - arr[:, 0]) / arr[:, 0] * 100, 2)
         
         return pivot.reset_index()
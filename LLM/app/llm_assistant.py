@@ -4,7 +4,9 @@ Module pour l'assistant LLM avec OpenAI
 
 import os
 from typing import List, Dict
+import httpx
 import pandas as pd
+import tiktoken
 from openai import OpenAI
 import yaml
 from pathlib import Path
@@ -34,11 +36,35 @@ class LLMAssistant:
         if not api_key:
             raise ValueError("OPENAI_API_KEY non trouvée dans les variables d'environnement")
         
-        self.client = OpenAI(api_key=api_key)
+        # Client HTTP partagé : HTTP/2 et connexions keep-alive réutilisées
+        # entre les requêtes, pour économiser un handshake TLS par message
+        self.client = OpenAI(
+            api_key=api_key,
+            http_client=httpx.Client(
+                http2=True,
+                timeout=30.0,
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+            )
+        )
         self.model = self.config['llm']['model']
         self.temperature = self.config['llm']['temperature']
         self.max_tokens = self.config['llm']['max_tokens']
-        
+        self.history_token_budget = self.config['llm'].get('history_token_budget', 4000)
+
+        # Encodeur de tokens pour borner l'historique. tiktoken télécharge
+        # ses fichiers d'encodage au premier usage : sans réseau (ou modèle
+        # inconnu), on retombe sur une estimation ~4 caractères par token
+        # plutôt que de faire échouer le démarrage
+        try:
+            self._encoding = tiktoken.encoding_for_model(self.model)
+        except KeyError:
+            try:
+                self._encoding = tiktoken.get_encoding('cl100k_base')
+            except Exception:
+                self._encoding = None
+        except Exception:
+            self._encoding = None
+
         # Historique de conversation
         self.conversation_history = []
     
@@ -64,19 +90,22 @@ class LLMAssistant:
             data_sample = data
             context = f"Voici les données complètes ({len(data)} lignes) :\n\n"
         
-        # Convertir en format texte lisible
-        context += data_sample.to_string(index=False)
-        
+        # Convertir en format texte lisible (to_csv est implémenté en C,
+        # contrairement à to_string qui formate chaque cellule en Python)
+        context += data_sample.to_csv(sep='\t', index=False)
+
         # Ajouter des statistiques résumées si beaucoup de données
         if len(data) > max_rows:
             context += f"\n\nStatistiques globales :\n"
             context += f"- Total de lignes : {len(data)}\n"
-            
+
             if 'Predicted_Quantity' in data.columns:
-                context += f"- Quantité totale : {data['Predicted_Quantity'].sum():,}\n"
-                context += f"- Quantité moyenne : {data['Predicted_Quantity'].mean():.2f}\n"
-                context += f"- Quantité min : {data['Predicted_Quantity'].min()}\n"
-                context += f"- Quantité max : {data['Predicted_Quantity'].max()}\n"
+                # Les quatre réductions en une seule passe sur la colonne
+                qty_stats = data['Predicted_Quantity'].agg(['sum', 'mean', 'min', 'max'])
+                context += f"- Quantité totale : {qty_stats['sum']:,}\n"
+                context += f"- Quantité moyenne : {qty_stats['mean']:.2f}\n"
+                context += f"- Quantité min : {qty_stats['min']}\n"
+                context += f"- Quantité max : {qty_stats['max']}\n"
             
             if 'City_State' in data.columns:
                 context += f"- Nombre de villes : {data['City_State'].nunique()}\n"
@@ -86,16 +115,20 @@ class LLMAssistant:
         
         return context
     
-    def ask(self, query: str, context_data: pd.DataFrame = None) -> str:
+    def ask(self, query: str, context_data: pd.DataFrame = None):
         """
-        Pose une question à l'assistant
-        
+        Pose une question à l'assistant, en streaming
+
+        Générateur : les morceaux de réponse sont produits dès leur arrivée
+        (à consommer par ex. avec st.write_stream), ce qui affiche le début
+        de la réponse au premier token au lieu d'attendre la fin.
+
         Args:
             query: Question de l'utilisateur
             context_data: Données contextuelles (optionnel)
-            
-        Returns:
-            Réponse de l'assistant
+
+        Yields:
+            Morceaux de la réponse de l'assistant
         """
         # Préparer les messages
         messages = [
@@ -114,30 +147,60 @@ class LLMAssistant:
         # Ajouter la question de l'utilisateur
         messages.append({"role": "user", "content": query})
         
-        # Appeler l'API OpenAI
+        # Appeler l'API OpenAI en streaming
         try:
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 temperature=self.temperature,
-                max_tokens=self.max_tokens
+                max_tokens=self.max_tokens,
+                stream=True
             )
-            
-            answer = response.choices[0].message.content
-            
+
+            chunks = []
+            for chunk in response:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    chunks.append(delta)
+                    yield delta
+
+            answer = ''.join(chunks)
+
             # Mettre à jour l'historique
             self.conversation_history.append({"role": "user", "content": query})
             self.conversation_history.append({"role": "assistant", "content": answer})
-            
-            # Limiter l'historique à 10 messages (5 échanges)
-            if len(self.conversation_history) > 10:
-                self.conversation_history = self.conversation_history[-10:]
-            
-            return answer
-            
+
+            # Borner l'historique par son poids en tokens plutôt que par
+            # un nombre fixe de messages
+            self._trim_history()
+
         except Exception as e:
-            return f"❌ Erreur lors de l'appel à l'API OpenAI : {str(e)}"
+            yield f"❌ Erreur lors de l'appel à l'API OpenAI : {str(e)}"
     
+    def _trim_history(self):
+        """
+        Tronque l'historique pour tenir dans le budget de tokens
+
+        Garde les messages les plus récents dont le total de tokens reste
+        sous history_token_budget : dix messages courts tiennent tous, mais
+        un seul échange très long ne fait plus déborder le contexte.
+        """
+        kept = []
+        total = 0
+
+        for message in reversed(self.conversation_history):
+            if self._encoding is not None:
+                tokens = len(self._encoding.encode(message['content']))
+            else:
+                tokens = len(message['content']) // 4 + 1
+            if total + tokens > self.history_token_budget:
+                break
+            kept.append(message)
+            total += tokens
+
+        kept.reverse()
+        self.conversation_history = kept
+
     def reset_conversation(self):
         """Réinitialise l'historique de conversation"""
         self.conversation_history = []
@@ -3,7 +3,8 @@ Module pour analyser les questions et extraire les données pertinentes
 """
 
 import re
-from typing import Dict, Optional, List
+from functools import lru_cache
+from typing import Dict, Optional, List, Tuple
 import pandas as pd
 from data_loader import DataLoader
 
@@ -20,17 +21,24 @@ class QueryAnalyzer:
         """
         self.data_loader = data_loader
         
-        # Patterns pour détecter les intentions
-        self.patterns = {
+        # Patterns pour détecter les intentions, compilés une seule fois
+        # (IGNORECASE sauf pour specific_city, qui repose sur la casse)
+        raw_patterns = {
             'stock_increase': r'(augment|stock|approvision|commander|livr)',
             'comparison': r'(compar|versus|vs|différence|entre)',
             'growth': r'(progress|croissance|évolu|augment|tendance)',
             'top_cities': r'(top|meilleur|plus fort|classement)',
-            'specific_city': r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s*\(([A-Z]{2})\)',
             'product_thinkpad': r'(thinkpad|laptop|ordinateur)',
             'product_batteries': r'(batter|pile|aaa)',
             'month': r'(mars|avril|mai|march|april|may|2020-0[3-5])',
         }
+        self.patterns = {
+            key: re.compile(pattern, re.IGNORECASE)
+            for key, pattern in raw_patterns.items()
+        }
+        self.patterns['specific_city'] = re.compile(
+            r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s*\(([A-Z]{2})\)'
+        )
         
         # Mapping des villes (pour gérer les variations)
         self.city_mapping = {
@@ -46,6 +54,16 @@ class QueryAnalyzer:
             'portland': 'Portland (ME)',
             'washington': 'Washington DC',
         }
+
+        # Alternance compilée sur toutes les clés : une seule passe sur la
+        # requête au lieu d'un scan par ville (clés longues d'abord pour que
+        # 'san francisco' l'emporte sur un éventuel préfixe)
+        self._city_pattern = re.compile(
+            '|'.join(
+                re.escape(key)
+                for key in sorted(self.city_mapping, key=len, reverse=True)
+            )
+        )
     
     def extract_cities(self, query: str) -> List[str]:
         """
@@ -54,19 +72,32 @@ class QueryAnalyzer:
         Args:
             query: Question de l'utilisateur
             
+        Returns:
+            Liste des villes trouvées
+        """
+        return self._extract_cities(query, query.lower())
+
+    def _extract_cities(self, query: str, query_lower: str) -> List[str]:
+        """
+        Extrait les villes à partir de la requête et de sa version minuscule
+
+        Args:
+            query: Question de l'utilisateur
+            query_lower: Même question déjà passée en minuscules
+
         Returns:
             Liste des villes trouvées
         """
         cities = []
-        query_lower = query.lower()
-        
-        # Chercher les villes dans le mapping
+
+        # Chercher les villes du mapping en une seule passe sur la requête
+        matched_keys = set(self._city_pattern.findall(query_lower))
         for city_key, city_full in self.city_mapping.items():
-            if city_key in query_lower:
+            if city_key in matched_keys:
                 cities.append(city_full)
         
         # Chercher les patterns "City (ST)"
-        matches = re.findall(self.patterns['specific_city'], query)
+        matches = self.patterns['specific_city'].findall(query)
         for match in matches:
             city_name, state = match
             city_full = f"{city_name} ({state})"
@@ -85,11 +116,9 @@ class QueryAnalyzer:
         Returns:
             Nom du produit ou None
         """
-        query_lower = query.lower()
-        
-        if re.search(self.patterns['product_thinkpad'], query_lower):
+        if self.patterns['product_thinkpad'].search(query):
             return 'ThinkPad Laptop'
-        elif re.search(self.patterns['product_batteries'], query_lower):
+        elif self.patterns['product_batteries'].search(query):
             return 'AAA Batteries (4-pack)'
         
         return None
@@ -104,15 +133,13 @@ class QueryAnalyzer:
         Returns:
             Type d'intention détecté
         """
-        query_lower = query.lower()
-        
-        if re.search(self.patterns['comparison'], query_lower):
+        if self.patterns['comparison'].search(query):
             return 'comparison'
-        elif re.search(self.patterns['growth'], query_lower):
+        elif self.patterns['growth'].search(query):
             return 'growth'
-        elif re.search(self.patterns['top_cities'], query_lower):
+        elif self.patterns['top_cities'].search(query):
             return 'top_cities'
-        elif re.search(self.patterns['stock_increase'], query_lower):
+        elif self.patterns['stock_increase'].search(query):
             return 'stock_increase'
         else:
             return 'general'
@@ -120,24 +147,45 @@ class QueryAnalyzer:
     def get_relevant_data(self, query: str) -> pd.DataFrame:
         """
         Récupère les données pertinentes pour la requête
-        
+
         Args:
             query: Question de l'utilisateur
-            
+
         Returns:
             DataFrame avec les données pertinentes
         """
+        # Une seule mise en minuscules, partagée par les extractions
+        query_lower = query.lower()
+
         # Détecter l'intention
         intent = self.detect_intent(query)
-        
+
         # Extraire les entités
-        cities = self.extract_cities(query)
+        cities = self._extract_cities(query, query_lower)
         product = self.extract_product(query)
-        
+
+        # Les questions de suivi retombent souvent sur le même filtre :
+        # mémoïser sur (intention, produit, villes) évite de refiltrer
+        return self._relevant_data(intent, product, tuple(cities))
+
+    @lru_cache(maxsize=128)
+    def _relevant_data(self, intent: str, product: Optional[str],
+                       cities: Tuple[str, ...]) -> pd.DataFrame:
+        """
+        Filtre les données pour une combinaison (intention, produit, villes)
+
+        Args:
+            intent: Intention détectée
+            product: Produit extrait (ou None)
+            cities: Villes extraites, sous forme de tuple hashable
+
+        Returns:
+            DataFrame avec les données pertinentes
+        """
         # Charger les données si nécessaire
         if self.data_loader.monthly_df is None:
             self.data_loader.load_data()
-        
+
         # Filtrer les données selon l'intention
         if intent == 'comparison' and len(cities) >= 2:
             # Comparaison entre villes
@@ -153,28 +201,32 @@ class QueryAnalyzer:
         elif intent == 'top_cities':
             # Top villes
             if product:
-                top_cities = self.data_loader.get_top_cities(product, n=10)
-                # Joindre avec les données mensuelles pour plus de détails
-                data = self.data_loader.monthly_df[
-                    (self.data_loader.monthly_df['Product'] == product) &
-                    (self.data_loader.monthly_df['City_State'].isin(top_cities['City_State']))
-                ]
+                # Une seule extraction du produit, réutilisée pour le
+                # classement et pour le détail mensuel
+                product_df = self.data_loader.get_product_data(product)
+                top_cities = (
+                    product_df
+                    .groupby('City_State', observed=True)['Predicted_Quantity']
+                    .sum()
+                    .nlargest(10)
+                )
+                data = product_df[product_df['City_State'].isin(top_cities.index)]
             else:
-                data = self.data_loader.monthly_df.copy()
+                data = self.data_loader.monthly_df
         
         elif intent == 'stock_increase':
             # Recommandations de stock
             if product:
                 data = self.data_loader.get_product_data(product)
             else:
-                data = self.data_loader.monthly_df.copy()
+                data = self.data_loader.monthly_df
             
             if cities:
                 data = data[data['City_State'].isin(cities)]
         
         else:
             # Requête générale
-            data = self.data_loader.monthly_df.copy()
+            data = self.data_loader.monthly_df
             
             # Filtrer par produit si spécifié
             if product:
@@ -198,7 +250,7 @@ class QueryAnalyzer:
         """
         return {
             'intent': self.detect_intent(query),
-            'cities': self.extract_cities(query),
+            'cities': self._extract_cities(query, query.lower()),
             'product': self.extract_product(query),
             'query': query
         }
@@ -2,7 +2,10 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import pyarrow as pa
+import pyarrow.csv as pacsv
 from pathlib import Path
+import io
 import os
 from dotenv import load_dotenv
 
@@ -65,6 +68,48 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+@st.cache_data
+def dataframe_to_csv_bytes(df: pd.DataFrame) -> bytes:
+    """Sérialise un DataFrame en CSV via le writer C de pyarrow (en cache)"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    # Les timestamps ne portent que des dates : les exporter en YYYY-MM-DD
+    # comme l'ancien to_csv, sans composante horaire
+    for i, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.date32()))
+
+    # En-tête écrit à la main et champs non quotés : pyarrow quote sinon
+    # toutes les chaînes, alors que l'ancien export to_csv ne quotait rien
+    header = (','.join(df.columns) + '\n').encode('utf-8')
+
+    buffer = io.BytesIO()
+    buffer.write(header)
+    try:
+        pacsv.write_csv(
+            table,
+            buffer,
+            pacsv.WriteOptions(include_header=False, quoting_style='none')
+        )
+    except pa.ArrowInvalid:
+        # Une valeur contient le délimiteur : réécrire avec quotes
+        buffer = io.BytesIO()
+        buffer.write(header)
+        pacsv.write_csv(
+            table,
+            buffer,
+            pacsv.WriteOptions(include_header=False, quoting_style='needed')
+        )
+
+    return buffer.getvalue()
+
+
+@st.cache_data
+def load_dataframes(monthly_path: str, daily_path: str):
+    """Charge les DataFrames de prédictions (mis en cache par Streamlit)"""
+    return DataLoader(monthly_path, daily_path).load_data()
+
+
 @st.cache_resource
 def initialize_components():
     """Initialise les composants de l'application"""
@@ -78,14 +123,15 @@ def initialize_components():
         base_path = Path(__file__).parent.parent.parent
         monthly_path = base_path / "prediction" / "predictions_3_mois.csv"
         daily_path = base_path / "prediction" / "predictions_60_jours.csv"
-    
-    # Initialiser les composants
-    data_loader = DataLoader(str(monthly_path), str(daily_path))
-    data_loader.load_data()
-    
+
+    # Initialiser les composants : les DataFrames viennent du cache de
+    # données, le loader ne fait que reconstruire ses index dérivés
+    monthly_df, daily_df = load_dataframes(str(monthly_path), str(daily_path))
+    data_loader = DataLoader.from_frames(monthly_df, daily_df)
+
     llm_assistant = LLMAssistant()
     query_analyzer = QueryAnalyzer(data_loader)
-    
+
     return data_loader, llm_assistant, query_analyzer
 
 
@@ -128,12 +174,31 @@ def display_sidebar(data_loader):
             st.session_state.suggested_question = question
 
 
+@st.cache_data
+def aggregate_product(product: str, monthly_df: pd.DataFrame):
+    """Prépare les agrégations des graphiques pour un produit (en cache)"""
+    product_df = monthly_df[monthly_df['Product'] == product]
+    monthly_total = (
+        product_df
+        .groupby('Month', observed=True)['Predicted_Quantity']
+        .sum()
+        .reset_index()
+    )
+    top_cities = (
+        product_df
+        .groupby('City_State', observed=True)['Predicted_Quantity']
+        .sum()
+        .nlargest(10)
+    )
+    return product_df, monthly_total, top_cities
+
+
 def display_visualizations(data_loader):
     """Affiche les visualisations des données"""
     st.markdown("## 📈 Visualisations")
-    
+
     monthly_df = data_loader.monthly_df
-    
+
     # Sélection du produit
     col1, col2 = st.columns(2)
     with col1:
@@ -141,10 +206,10 @@ def display_visualizations(data_loader):
             "Sélectionner un produit",
             options=monthly_df['Product'].unique()
         )
-    
-    # Filtrer les données
-    product_df = monthly_df[monthly_df['Product'] == selected_product]
-    
+
+    # Filtre et agrégations calculés une fois par produit, pas à chaque rerun
+    product_df, monthly_total, top_cities = aggregate_product(selected_product, monthly_df)
+
     # Graphique 1: Demande par ville et mois
     fig1 = px.bar(
         product_df,
@@ -159,7 +224,6 @@ def display_visualizations(data_loader):
     st.plotly_chart(fig1, use_container_width=True)
     
     # Graphique 2: Évolution temporelle
-    monthly_total = product_df.groupby('Month')['Predicted_Quantity'].sum().reset_index()
     fig2 = px.line(
         monthly_total,
         x='Month',
@@ -172,7 +236,6 @@ def display_visualizations(data_loader):
     st.plotly_chart(fig2, use_container_width=True)
     
     # Graphique 3: Top 10 villes
-    top_cities = product_df.groupby('City_State')['Predicted_Quantity'].sum().sort_values(ascending=False).head(10)
     fig3 = px.bar(
         x=top_cities.values,
         y=top_cities.index,
@@ -241,9 +304,8 @@ def display_chat_interface(llm_assistant, query_analyzer):
                     st.write(f"**Villes:** {', '.join(query_summary['cities'])}")
                 st.write(f"**Données pertinentes:** {len(relevant_data)} lignes")
         
-        # Obtenir la réponse de l'assistant
-        with st.spinner("🤖 Génération de la réponse..."):
-            response = llm_assistant.ask(user_query, relevant_data)
+        # Afficher la réponse au fil de l'eau dès les premiers tokens
+        response = st.write_stream(llm_assistant.ask(user_query, relevant_data))
         
         # Ajouter la réponse à l'historique
         st.session_state.chat_history.append({
@@ -300,7 +362,7 @@ def main():
             st.dataframe(data_loader.monthly_df, use_container_width=True)
             st.download_button(
                 "📥 Télécharger (CSV)",
-                data_loader.monthly_df.to_csv(index=False).encode('utf-8'),
+                dataframe_to_csv_bytes(data_loader.monthly_df),
                 "predictions_mensuelles.csv",
                 "text/csv"
             )
@@ -308,7 +370,7 @@ def main():
             st.dataframe(data_loader.daily_df, use_container_width=True)
             st.download_button(
                 "📥 Télécharger (CSV)",
-                data_loader.daily_df.to_csv(index=False).encode('utf-8'),
+                dataframe_to_csv_bytes(data_loader.daily_df),
                 "predictions_journalieres.csv",
                 "text/csv"
             )